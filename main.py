@@ -4,18 +4,21 @@ Entry point for the application - orchestrates vision, action, and AI components
 """
 
 import os
+import re
 import sys
 import time
 import json
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait as futures_wait
 from pathlib import Path
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 
 from dotenv import load_dotenv
+from PIL import Image
 
 from src.vision.capture import ScreenCapture, ScreenCaptureError
 from src.vision.scanner import UIScanner, UIScannerError
 from src.action.controller import DesktopController, DesktopControllerError
-from src.agent.brain import GeminiAgent, GeminiAgentError
+from src.agent.brain import GeminiAgent, GeminiAgentError, PlanStep, MAX_UPLOAD_IMAGE_SIDE
 from src.utils.logger import TaskLogger
 import ctypes
 
@@ -30,6 +33,14 @@ except Exception:
 MAX_ITERATIONS = 15  # Prevent infinite loops and cost overruns
 SCREENSHOT_PATH = "temp_screenshot.png"
 
+# Multi-step task indicators, compiled once: a single case-insensitive
+# scan replaces one lowered-copy substring pass per keyword per task
+_COMPLEX_TASK_RE = re.compile(r"and|then|after|first|next|finally|,", re.IGNORECASE)
+
+# Playwright's sync API is bound to the thread that first starts it, so
+# these tools must always run on the same dedicated worker thread
+_WEB_TOOLS = frozenset({"web_click", "web_type", "web_get_elements"})
+
 
 class AutonomousAgent:
     """
@@ -76,11 +87,13 @@ class AutonomousAgent:
         print(f"   Screen resolution: {screen_width}x{screen_height}")
         
         # Initialize desktop controller with coordinate scaling
-        # AI will analyze full-res images (no downscaling for now)
+        # The agent downscales screenshots to MAX_UPLOAD_IMAGE_SIDE before
+        # upload, so the controller must scale from the size the AI sees
         print("🖱️  Initializing desktop controller...")
+        downscale = min(1.0, MAX_UPLOAD_IMAGE_SIDE / max(screen_width, screen_height))
         self.controller = DesktopController(
-            ai_image_width=screen_width,
-            ai_image_height=screen_height,
+            ai_image_width=round(screen_width * downscale),
+            ai_image_height=round(screen_height * downscale),
             action_delay=0.5,
             failsafe=True
         )
@@ -111,6 +124,13 @@ class AutonomousAgent:
         )
         print("   Set-of-Marks mode available")
         
+        # Persistent single worker that owns the Playwright connection:
+        # the sync API is greenlet-bound to the thread that starts it, so
+        # every web_* call (and teardown) must land on this same thread
+        self._web_pool = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="playwright"
+        )
+
         # Conversation history
         self.history: List[Dict[str, Any]] = []
         
@@ -188,7 +208,17 @@ class AutonomousAgent:
                     "Falling back to Grid mode (no UI elements detected or scan failed)"
                 )
                 
-                grid_image = self.screen_capture.add_grid_overlay(raw_image)
+                # Downscale BEFORE drawing the grid so the coordinate
+                # labels baked into the pixels are in the same space the
+                # controller scales back to screen coordinates; the
+                # agent-side encoder then leaves the already-small frame
+                # untouched instead of shrinking full-resolution labels
+                grid_source = raw_image.copy()
+                grid_source.thumbnail(
+                    (MAX_UPLOAD_IMAGE_SIDE, MAX_UPLOAD_IMAGE_SIDE),
+                    Image.LANCZOS
+                )
+                grid_image = self.screen_capture.add_grid_overlay(grid_source)
                 grid_image.save(SCREENSHOT_PATH)
             
             print(f"   Saved to: {SCREENSHOT_PATH}")
@@ -419,7 +449,103 @@ class AutonomousAgent:
             error_msg = f"Failed to execute {name}: {e}"
             print(f"   ❌ {error_msg}")
             return error_msg
-    
+
+    def execute_plan(self, plan: List[PlanStep]) -> List[str]:
+        """
+        Execute a dependency-ordered plan, overlapping independent steps.
+
+        Input-injecting steps serialize through their dependencies, while
+        read-only steps (e.g., web_get_elements) run concurrently with the
+        actions that follow them instead of blocking the whole chain.
+
+        Args:
+            plan: List of PlanStep objects from the agent.
+
+        Returns:
+            Execution result messages in original step order.
+        """
+        results: Dict[int, str] = {}
+        completed: set = set()
+        pending = {step.id: step for step in plan}
+
+        def run_step(step: PlanStep) -> str:
+            result_msg = self.execute_function_call({"name": step.name, "args": step.args})
+            # Let the UI settle after input actions (read-only steps skip this)
+            if step.name not in GeminiAgent.READ_ONLY_TOOLS:
+                time.sleep(2)
+            return result_msg
+
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            futures = {}
+            while pending or futures:
+                # Dispatch every step whose dependencies are satisfied
+                ready = [s for s in pending.values() if all(d in completed for d in s.deps)]
+                for step in ready:
+                    del pending[step.id]
+                    # Web steps go to the dedicated Playwright thread;
+                    # desktop input steps can run on any worker
+                    executor = self._web_pool if step.name in _WEB_TOOLS else pool
+                    futures[executor.submit(run_step, step)] = step
+
+                if not futures:
+                    break  # Remaining steps have unsatisfiable deps (shouldn't happen)
+
+                done, _ = futures_wait(futures, return_when=FIRST_COMPLETED)
+                for future in done:
+                    step = futures.pop(future)
+                    results[step.id] = future.result()
+                    completed.add(step.id)
+
+        return [results[step.id] for step in plan if step.id in results]
+
+    def analyze_and_execute_streamed(
+        self,
+        user_request: str,
+        screenshot_path: str,
+        detected_elements: Optional[List[Dict[str, Any]]] = None
+    ) -> Tuple[str, List[Dict[str, Any]], List[str]]:
+        """
+        Stream the analysis and execute tool calls while Gemini still decodes.
+
+        Each function call is handed to the persistent single-worker
+        executor the moment its part closes, so the first mouse/keyboard
+        action starts during generation and total latency approaches
+        max(decode, execution) instead of their sum. The single worker
+        keeps execution order identical to the serial path, and since it
+        is also the Playwright thread, web_* calls keep their required
+        thread affinity.
+
+        Returns:
+            (text_response, function_calls, execution_results) matching the
+            shapes used by the blocking path.
+        """
+        text_parts: List[str] = []
+        function_calls: List[Dict[str, Any]] = []
+        futures = []
+
+        def run_call(call: Dict[str, Any]) -> str:
+            result_msg = self.execute_function_call(call)
+            if call["name"] not in GeminiAgent.READ_ONLY_TOOLS:
+                time.sleep(2)
+            return result_msg
+
+        events = self.agent.analyze_and_act_stream(
+            user_request,
+            screenshot_path,
+            chat_history=self.history,
+            detected_elements=detected_elements
+        )
+        for event in events:
+            if "text" in event:
+                text_parts.append(event["text"])
+            elif "function_call" in event:
+                call = event["function_call"]
+                function_calls.append(call)
+                futures.append(self._web_pool.submit(run_call, call))
+        execution_results = [future.result() for future in futures]
+
+        return "".join(text_parts), function_calls, execution_results
+
     def run_task(self, user_task: str) -> bool:
         """
         Execute a user task through autonomous operation.
@@ -434,11 +560,13 @@ class AutonomousAgent:
         print(f"🎯 Task: {user_task}")
         print("=" * 60)
         print()
-        
+
+        # Start each task with a fresh server-side chat session
+        self.agent.reset_session()
+
         # Step 0: Generate a plan for complex tasks (optional)
         # Check if task seems complex (multiple steps implied)
-        complex_indicators = ["and", "then", "after", "first", "next", "finally", ","]
-        is_complex_task = any(indicator in user_task.lower() for indicator in complex_indicators) or len(user_task.split()) > 8
+        is_complex_task = bool(_COMPLEX_TASK_RE.search(user_task)) or len(user_task.split()) > 8
         
         if is_complex_task:
             print("🧩 Task appears complex - generating hierarchical plan...")
@@ -548,20 +676,19 @@ class AutonomousAgent:
                 )
                 
                 # Step C: Parse response
-                text_response = result.get("text_response", "")
-                function_calls = result.get("function_calls", [])
+                text_response = result.text_response
+                function_calls = result.function_calls
                 
                 # Log agent's thought process (ReAct pattern)
                 if text_response:
                     print(f"💭 AI Thought: {text_response}")
                     self.logger.log_thought(text_response)
                     
-                    # Check for sub-goal completion signals
+                    # Check for sub-goal completion signals (labels come from
+                    # the one-pass classifier in the agent)
                     if self.plan and self.current_subgoal_index < len(self.plan):
-                        response_lower = text_response.lower()
-                        
                         # Sub-goal completed
-                        if "sub-goal complete" in response_lower or "subgoal complete" in response_lower:
+                        if "subgoal_complete" in result.labels:
                             print(f"\n   ✅ Sub-goal completed: {self.plan[self.current_subgoal_index]}")
                             self.logger.log_subgoal_progress(
                                 self.current_subgoal_index,
@@ -583,7 +710,7 @@ class AutonomousAgent:
                                 print(f"\n▶️  Moving to next sub-goal: {self.plan[self.current_subgoal_index]}")
                         
                         # Sub-goal impossible - trigger re-planning
-                        elif "sub-goal impossible" in response_lower or "subgoal impossible" in response_lower:
+                        elif "subgoal_impossible" in result.labels:
                             print(f"\n   ⚠️  Sub-goal deemed impossible: {self.plan[self.current_subgoal_index]}")
                             print("   🔄 Triggering re-planning...")
                             
@@ -656,19 +783,17 @@ class AutonomousAgent:
                     else:
                         self.last_action_signature = action_signature
                     
-                    execution_results = []
-                    
-                    for func_call in function_calls:
-                        result_msg = self.execute_function_call(func_call)
-                        execution_results.append(result_msg)
+                    # Execute via the dependency-aware plan (independent steps
+                    # overlap); fall back to a serial chain if no plan attached
+                    plan = result.plan or GeminiAgent.build_execution_plan(function_calls)
+                    execution_results = self.execute_plan(plan)
+
+                    for result_msg in execution_results:
                         print(f"   ✅ {result_msg}")
-                        
+
                         # LOG: Execution result
                         self.logger.log_execution_result(result_msg)
-                        
-                        # Small delay between actions
-                        time.sleep(2)
-                    
+
                     # Add to conversation history
                     self.history.append({
                         "iteration": iteration,
@@ -677,15 +802,18 @@ class AutonomousAgent:
                         "function_calls": function_calls,
                         "execution_results": execution_results
                     })
+
+                    # A turn can both act and declare completion (e.g. a
+                    # fast-routed single-keystroke task, or a final chained
+                    # response ending in 'task complete')
+                    if "task_complete" in result.labels:
+                        print("\n✅ AI indicates task is complete!")
+                        task_complete = True
                 else:
                     print("   ℹ️  No actions to execute")
                     
                     # Check if AI indicates completion
-                    completion_phrases = [
-                        "task complete", "finished", "done",
-                        "successfully completed", "accomplished"
-                    ]
-                    if any(phrase in text_response.lower() for phrase in completion_phrases):
+                    if "task_complete" in result.labels:
                         print("\n✅ AI indicates task is complete!")
                         task_complete = True
                         break
@@ -743,14 +871,23 @@ class AutonomousAgent:
         """Clean up resources."""
         print("\n🧹 Cleaning up...")
         
-        # Close Playwright connection
+        # Drop uploaded screenshot handles on the Gemini side
+        if hasattr(self, 'agent'):
+            try:
+                self.agent.purge_uploads()
+            except Exception:
+                pass
+
+        # Close Playwright on the thread that owns it, then retire it
         if hasattr(self, 'controller'):
             try:
-                self.controller.close_playwright()
+                self._web_pool.submit(self.controller.close_playwright).result()
                 print("   Closed Playwright connection")
             except Exception:
                 pass
-        
+        if hasattr(self, '_web_pool'):
+            self._web_pool.shutdown(wait=False)
+
         # Close screen capture
         if hasattr(self, 'screen_capture'):
             self.screen_capture.close()
@@ -5,9 +5,23 @@ Includes Playwright integration for precise web interaction.
 """
 
 from typing import Optional, Tuple, List, Dict, Any
+import logging
+import numpy as np
 import pyautogui
 import time
 
+# Module logger - silent by default, enable with logging.basicConfig(level=logging.DEBUG)
+logger = logging.getLogger(__name__)
+
+# Translation table for escaping text embedded in Playwright :has-text("...")
+# selectors - built once at import, applied in a single C-level pass
+_SELECTOR_TEXT_ESCAPE = str.maketrans({'\\': '\\\\', '"': '\\"'})
+
+
+def _escape_selector_text(text: str) -> str:
+    """Escape quotes/backslashes for use inside a :has-text(\"...\") selector."""
+    return text.translate(_SELECTOR_TEXT_ESCAPE)
+
 
 class DesktopControllerError(Exception):
     """Exception raised when desktop control action fails."""
@@ -45,18 +59,20 @@ class DesktopController:
         ai_image_height: Optional[int] = None,
         action_delay: float = 0.5,
         failsafe: bool = True,
-        enable_playwright: bool = True
+        enable_playwright: bool = True,
+        dry_run: bool = False
     ) -> None:
         """
         Initialize the DesktopController with safety settings.
-        
+
         Args:
             ai_image_width: Width of image sent to AI (None = no scaling).
             ai_image_height: Height of image sent to AI (None = no scaling).
             action_delay: Delay between actions in seconds. Default is 0.5.
             failsafe: Enable PyAutoGUI failsafe (move to corner to abort).
             enable_playwright: Enable Playwright for web automation. Default is True.
-        
+            dry_run: Validate action plans without executing them. Default is False.
+
         Example:
             >>> # AI analyzes 1024x768 image, but screen is 1920x1080
             >>> controller = DesktopController(
@@ -84,6 +100,23 @@ class DesktopController:
         self.scale_x = self.screen_width / self.ai_image_width
         self.scale_y = self.screen_height / self.ai_image_height
         
+        # Dry-run mode: rebind action methods to validation-only stubs once,
+        # at construction time, so the hot path carries no per-call branch
+        self.dry_run = dry_run
+        if dry_run:
+            self.move_mouse = self._noop_move_mouse
+            self.click_element = self._noop_click_element
+            self.type_text = self._noop_type_text
+            self.scroll = self._noop_scroll
+            self.press_key = self._noop_press_key
+            self.hotkey = self._noop_hotkey
+            self.wait = self._noop_wait
+            # Web actions drive a real browser; stub them too so a plan
+            # with web steps stays side-effect free (web_get_elements is
+            # read-only and keeps working for plan validation)
+            self.web_click = self._noop_web_click
+            self.web_type = self._noop_web_type
+
         # Playwright integration (optional)
         self.enable_playwright = enable_playwright
         self.playwright_context = None
@@ -95,14 +128,16 @@ class DesktopController:
             try:
                 from playwright.sync_api import sync_playwright
                 self.playwright_available = True
-                print("   ✅ Playwright available for web automation")
+                logger.debug("Playwright available for web automation")
             except ImportError:
                 self.playwright_available = False
-                print("   ⚠️  Playwright not installed (web automation disabled)")
-                print("      Install with: pip install playwright && playwright install chromium")
+                logger.warning(
+                    "Playwright not installed (web automation disabled). "
+                    "Install with: pip install playwright && playwright install chromium"
+                )
             except Exception as e:
                 self.playwright_available = False
-                print(f"   ⚠️  Playwright error: {e}")
+                logger.warning("Playwright error: %s", e)
     
     def scale_coordinates(self, x: int, y: int) -> Tuple[int, int]:
         """
@@ -130,7 +165,39 @@ class DesktopController:
         scaled_x = int(x * self.scale_x)
         scaled_y = int(y * self.scale_y)
         return scaled_x, scaled_y
-    
+
+    def scale_coordinates_batch(
+        self,
+        xs: List[int],
+        ys: List[int]
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Scale a batch of AI coordinates to real screen coordinates.
+
+        Vectorized variant of scale_coordinates() for action planners that
+        prepare many clicks at once - one NumPy pass instead of N Python calls.
+
+        Args:
+            xs: Sequence of X coordinates from AI analysis.
+            ys: Sequence of Y coordinates from AI analysis.
+
+        Returns:
+            Tuple of (scaled_xs, scaled_ys) int32 arrays in screen coordinates.
+
+        Example:
+            >>> controller = DesktopController(
+            ...     ai_image_width=1024,
+            ...     ai_image_height=768
+            ... )
+            >>> xs, ys = controller.scale_coordinates_batch([512, 100], [384, 200])
+        """
+        arr_x = np.asarray(xs)
+        arr_y = np.asarray(ys)
+        return (
+            (arr_x * self.scale_x).astype(np.int32),
+            (arr_y * self.scale_y).astype(np.int32)
+        )
+
     def validate_coordinates(self, x: int, y: int) -> bool:
         """
         Check if coordinates are within screen bounds.
@@ -156,7 +223,47 @@ class DesktopController:
             )
         
         return True
-    
+
+    def validate_coordinates_batch(self, xs: List[int], ys: List[int]) -> bool:
+        """
+        Check that a whole batch of coordinates is within screen bounds.
+
+        Validates an entire action plan in one vectorized comparison before
+        any action executes, instead of N separate validate_coordinates calls.
+
+        Args:
+            xs: Sequence of X coordinates to validate.
+            ys: Sequence of Y coordinates to validate.
+
+        Returns:
+            True if all coordinates are valid.
+
+        Raises:
+            CoordinateOutOfBoundsError: If any coordinate is outside screen.
+
+        Example:
+            >>> controller = DesktopController()
+            >>> controller.validate_coordinates_batch([100, 200], [300, 400])
+            True
+        """
+        arr_x = np.asarray(xs)
+        arr_y = np.asarray(ys)
+        bad = (
+            (arr_x < 0) | (arr_x >= self.screen_width) |
+            (arr_y < 0) | (arr_y >= self.screen_height)
+        )
+        if bad.any():
+            bad_indices = np.flatnonzero(bad)
+            first = int(bad_indices[0])
+            raise CoordinateOutOfBoundsError(
+                f"{len(bad_indices)} coordinate(s) outside screen bounds "
+                f"(0-{self.screen_width}, 0-{self.screen_height}); "
+                f"first offender at index {first}: "
+                f"({int(arr_x[first])}, {int(arr_y[first])})"
+            )
+
+        return True
+
     def move_mouse(
         self,
         x: int,
@@ -237,15 +344,9 @@ class DesktopController:
             
             # Validate coordinates
             self.validate_coordinates(x, y)
-            
-            # Move to position
-            pyautogui.moveTo(x, y, duration=duration)
-            
-            # Small delay before clicking
-            time.sleep(0.1)
-            
-            # Perform click
-            pyautogui.click(button=button, clicks=clicks)
+
+            # Move and click in a single call (avoids an extra frame + sleep)
+            pyautogui.click(x=x, y=y, clicks=clicks, button=button, duration=duration)
             
         except (CoordinateOutOfBoundsError, pyautogui.FailSafeException):
             raise
@@ -319,15 +420,14 @@ class DesktopController:
             >>> controller.scroll(3, x=512, y=384)
         """
         try:
-            # Move to position if specified
+            # Scroll at specified position (moves and scrolls in one call)
             if x is not None and y is not None:
                 if scale:
                     x, y = self.scale_coordinates(x, y)
                 self.validate_coordinates(x, y)
-                pyautogui.moveTo(x, y, duration=0.2)
-            
-            # Perform scroll
-            pyautogui.scroll(clicks)
+                pyautogui.scroll(clicks, x=x, y=y)
+            else:
+                pyautogui.scroll(clicks)
         
         except (CoordinateOutOfBoundsError, pyautogui.FailSafeException):
             raise
@@ -451,7 +551,83 @@ class DesktopController:
             >>> controller.wait(5)
         """
         time.sleep(seconds)
-    
+
+    # ========== DRY-RUN VALIDATION STUBS ==========
+
+    def _noop_move_mouse(
+        self,
+        x: int,
+        y: int,
+        duration: float = 0.5,
+        scale: bool = True
+    ) -> None:
+        """Dry-run stub: validate coordinates without moving the mouse."""
+        if scale:
+            x, y = self.scale_coordinates(x, y)
+        self.validate_coordinates(x, y)
+
+    def _noop_click_element(
+        self,
+        x: int,
+        y: int,
+        button: str = "left",
+        clicks: int = 1,
+        duration: float = 0.3,
+        scale: bool = True
+    ) -> None:
+        """Dry-run stub: validate coordinates without clicking."""
+        if scale:
+            x, y = self.scale_coordinates(x, y)
+        self.validate_coordinates(x, y)
+
+    def _noop_type_text(
+        self,
+        text: str,
+        interval: float = 0.05,
+        press_enter: bool = False
+    ) -> None:
+        """Dry-run stub: accept text without typing it."""
+
+    def _noop_scroll(
+        self,
+        clicks: int,
+        x: Optional[int] = None,
+        y: Optional[int] = None,
+        scale: bool = True
+    ) -> None:
+        """Dry-run stub: validate coordinates without scrolling."""
+        if x is not None and y is not None:
+            if scale:
+                x, y = self.scale_coordinates(x, y)
+            self.validate_coordinates(x, y)
+
+    def _noop_press_key(self, key: str, presses: int = 1) -> None:
+        """Dry-run stub: accept key press without executing it."""
+
+    def _noop_hotkey(self, *keys: str) -> None:
+        """Dry-run stub: accept hotkey without executing it."""
+
+    def _noop_wait(self, seconds: int) -> None:
+        """Dry-run stub: skip the wait entirely."""
+
+    def _noop_web_click(self, selector: str, timeout: int = 5000) -> None:
+        """Dry-run stub: validate the selector without touching the browser."""
+        if not selector or not isinstance(selector, str):
+            raise WebAutomationError(f"Invalid selector: {selector!r}")
+
+    def _noop_web_type(
+        self,
+        selector: str,
+        text: str,
+        timeout: int = 5000,
+        press_enter: bool = False
+    ) -> None:
+        """Dry-run stub: validate the selector and text without typing."""
+        if not selector or not isinstance(selector, str):
+            raise WebAutomationError(f"Invalid selector: {selector!r}")
+        if not isinstance(text, str):
+            raise WebAutomationError(f"Invalid text: {text!r}")
+
     # ========== PLAYWRIGHT WEB AUTOMATION METHODS ==========
     
     def _ensure_browser_connection(self) -> bool:
@@ -485,42 +661,49 @@ class DesktopController:
             import socket
             
             # Check if CDP port is accessible
-            def is_port_open(host: str = 'localhost', port: int = 9222, timeout: float = 1.0) -> bool:
+            def is_port_open(host: str = 'localhost', port: int = 9222, timeout: float = 0.1) -> bool:
                 """Check if Chrome's CDP port is accessible."""
                 try:
                     sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+                    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
                     sock.settimeout(timeout)
                     result = sock.connect_ex((host, port))
                     sock.close()
                     return result == 0
                 except Exception:
                     return False
-            
-            # Retry logic: Check if port is open (Chrome might still be starting)
-            max_retries = 3
-            retry_delay = 1.0
-            
-            for attempt in range(max_retries):
+
+            # Retry with exponential backoff: probe immediately with a tight
+            # 100ms timeout instead of blocking 1s per attempt
+            delays = (0.05, 0.15, 0.5, 1.0)
+
+            for attempt, delay in enumerate(delays):
                 if is_port_open():
                     break
-                if attempt < max_retries - 1:
-                    print(f"   ⏳ Chrome CDP port not ready, retrying in {retry_delay}s... (attempt {attempt + 1}/{max_retries})")
-                    time.sleep(retry_delay)
+                if attempt < len(delays) - 1:
+                    logger.debug(
+                        "Chrome CDP port not ready, retrying in %ss (attempt %d/%d)",
+                        delay, attempt + 1, len(delays)
+                    )
+                    time.sleep(delay)
             else:
                 # Port never became available
-                print("   ⚠️  Chrome CDP port (9222) not accessible. Ensure Chrome is launched with --remote-debugging-port=9222")
+                logger.warning(
+                    "Chrome CDP port (%d) not accessible. "
+                    "Ensure Chrome is launched with --remote-debugging-port=9222", 9222
+                )
                 return False
-            
+
             # Initialize Playwright context if not already done
             if not hasattr(self, 'playwright_context') or self.playwright_context is None:
                 self.playwright_context = sync_playwright().start()
-                print("   🎭 Playwright context started")
-            
+                logger.debug("Playwright context started")
+
             # Connect to Chrome via CDP
             try:
                 self.browser = self.playwright_context.chromium.connect_over_cdp("http://localhost:9222")
-                print("   🔗 Connected to Chrome via CDP")
-                
+                logger.debug("Connected to Chrome via CDP")
+
                 # Get the first available page (or create one if none exist)
                 contexts = self.browser.contexts
                 if contexts and len(contexts) > 0:
@@ -528,27 +711,27 @@ class DesktopController:
                     pages = context.pages
                     if pages and len(pages) > 0:
                         self.page = pages[0]
-                        print(f"   📄 Using existing page: {self.page.url}")
+                        logger.debug("Using existing page: %s", self.page.url)
                     else:
                         self.page = context.new_page()
-                        print("   📄 Created new page")
+                        logger.debug("Created new page")
                 else:
                     # No context available, this shouldn't happen with CDP connection
-                    print("   ⚠️  No browser context found")
+                    logger.warning("No browser context found")
                     return False
-                
+
                 self._connection_attempted = True
                 return True
-                
+
             except Exception as e:
-                print(f"   ❌ Failed to connect via CDP: {e}")
+                logger.error("Failed to connect via CDP: %s", e)
                 return False
-        
+
         except ImportError:
-            print("   ⚠️  Playwright not available")
+            logger.warning("Playwright not available")
             return False
         except Exception as e:
-            print(f"   ❌ Browser connection error: {e}")
+            logger.error("Browser connection error: %s", e)
             return False
     
     def web_click(self, selector: str, timeout: int = 5000) -> None:
@@ -660,9 +843,9 @@ class DesktopController:
                     if name:
                         # Try to create a selector based on text content
                         if role == 'button':
-                            selector = f'button:has-text("{name[:30]}")'
+                            selector = f'button:has-text("{_escape_selector_text(name[:30])}")'
                         elif role == 'link':
-                            selector = f'a:has-text("{name[:30]}")'
+                            selector = f'a:has-text("{_escape_selector_text(name[:30])}")'
                         elif role in ['textbox', 'searchbox']:
                             selector = f'input[type="text"]'
                     
@@ -716,6 +899,6 @@ class DesktopController:
             if hasattr(self, 'playwright_context') and self.playwright_context:
                 self.playwright_context.stop()
                 self.playwright_context = None
-            print("   🧹 Playwright connection closed")
+            logger.debug("Playwright connection closed")
         except Exception as e:
-            print(f"   ⚠️  Error closing Playwright: {e}")
+            logger.warning("Error closing Playwright: %s", e)
@@ -3,15 +3,277 @@ AI Agent Brain Module
 Google Gemini-powered autonomous agent with function calling.
 """
 
-from typing import Optional, Dict, List, Any
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
+from functools import lru_cache
+from typing import ClassVar, Iterator, Optional, Dict, List, Any, Tuple
+import asyncio
+import copy
+import io
 import os
-from dotenv import load_dotenv
+import pickle
+import random
+import re
+import threading
+import time
 from google import genai
+from google.genai import errors as genai_errors
 from google.genai import types
+from PIL import Image
 from src.utils.logger import TaskLogger
 
-# Load environment variables
-load_dotenv()
+# Load .env only when the environment isn't already populated (skips the
+# filesystem stat/parse on production hosts and worker forks)
+if not os.environ.get("GOOGLE_API_KEY"):
+    from dotenv import load_dotenv
+    load_dotenv()
+
+# Largest side of the screenshot actually uploaded to Gemini; bigger
+# screens are downscaled before encoding to cut upload bytes/image tokens
+MAX_UPLOAD_IMAGE_SIDE = 1024
+
+
+# Optional C-level protobuf conversion for function-call args
+try:
+    from google.protobuf.json_format import MessageToDict
+except ImportError:
+    MessageToDict = None
+
+
+def _function_call_args(function_call: Any) -> Dict[str, Any]:
+    """
+    Convert a function call's args to a plain dict.
+
+    Uses protobuf's C-extension MessageToDict when the SDK exposes the
+    underlying proto (one C-level pass instead of a Python walk over the
+    MapField); falls back to dict() for SDK versions without _pb.
+    """
+    if not function_call.args:
+        return {}
+    pb = getattr(function_call, "_pb", None)
+    if pb is not None and MessageToDict is not None:
+        return MessageToDict(pb.args)
+    return dict(function_call.args)
+
+
+# Fast content hashing for screenshot deduplication: SIMD-accelerated
+# blake3 when installed, stdlib blake2b otherwise
+try:
+    from blake3 import blake3 as _new_hash
+except ImportError:
+    from hashlib import blake2b
+
+    def _new_hash(data: bytes):
+        return blake2b(data, digest_size=16)
+
+
+def _content_hash(data: bytes) -> bytes:
+    """Digest of raw bytes, used to detect unchanged screenshots."""
+    return _new_hash(data).digest()
+
+
+# Disk-backed response cache: replay byte-identical (screenshot, request,
+# model) analyses without a network call. Biggest win in debugging and
+# eval loops that retry the same frame; bounded by mtime-LRU pruning.
+_RESPONSE_CACHE_DIR = os.path.expanduser("~/.cache/gemini_agent")
+_RESPONSE_CACHE_MAX = 256
+
+
+def _response_cache_get(key: str) -> Optional["AnalyzeResult"]:
+    """Load a cached AnalyzeResult, refreshing its LRU recency."""
+    path = os.path.join(_RESPONSE_CACHE_DIR, key + ".pkl")
+    try:
+        with open(path, "rb") as f:
+            result = pickle.load(f)
+        os.utime(path)
+        return result
+    except (OSError, pickle.PickleError, EOFError, AttributeError):
+        return None
+
+
+def _response_cache_put(key: str, result: "AnalyzeResult") -> None:
+    """Persist an AnalyzeResult atomically and prune old entries."""
+    try:
+        os.makedirs(_RESPONSE_CACHE_DIR, exist_ok=True)
+        tmp_path = os.path.join(_RESPONSE_CACHE_DIR, f".{key}.tmp")
+        with open(tmp_path, "wb") as f:
+            pickle.dump(result, f, pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, os.path.join(_RESPONSE_CACHE_DIR, key + ".pkl"))
+
+        entries = [
+            os.path.join(_RESPONSE_CACHE_DIR, name)
+            for name in os.listdir(_RESPONSE_CACHE_DIR)
+            if name.endswith(".pkl")
+        ]
+        if len(entries) > _RESPONSE_CACHE_MAX:
+            entries.sort(key=os.path.getmtime)
+            for stale in entries[:len(entries) - _RESPONSE_CACHE_MAX]:
+                os.remove(stale)
+    except OSError:
+        pass
+
+
+def _read_file_bytes(path: str) -> bytes:
+    """
+    Read a file fully into bytes with a single read syscall.
+
+    Skips the Python-level buffered file object (and its extra copy),
+    which matters for multi-MB screenshots read every turn. O_BINARY
+    keeps Windows - the primary platform - from mangling the bytes with
+    text-mode translation; it does not exist elsewhere.
+    """
+    fd = os.open(path, os.O_RDONLY | getattr(os, "O_BINARY", 0))
+    try:
+        return os.read(fd, os.fstat(fd).st_size)
+    finally:
+        os.close(fd)
+
+
+@lru_cache(maxsize=8)
+def _encode_screenshot_cached(path: str, mtime: float, max_side: int) -> bytes:
+    """Downscale + JPEG-encode a screenshot, cached per (path, mtime)."""
+    # Pull the whole file in with one syscall and decode from memory,
+    # instead of PIL's many small buffered reads against the file
+    img = Image.open(io.BytesIO(_read_file_bytes(path)))
+    if max_side:
+        img.thumbnail((max_side, max_side), Image.LANCZOS)
+    if img.mode != "RGB":
+        img = img.convert("RGB")
+    buf = io.BytesIO()
+    img.save(buf, "JPEG", quality=80, optimize=True)
+    return buf.getvalue()
+
+
+def encode_screenshot(path: str, high_res: bool = False) -> bytes:
+    """
+    Prepare a screenshot for upload to Gemini.
+
+    Downscales the image so its largest side is MAX_UPLOAD_IMAGE_SIDE and
+    re-encodes it as JPEG quality 80, typically cutting the uploaded bytes
+    by an order of magnitude versus a full-resolution PNG. Encoded bytes
+    are cached keyed by (path, mtime) so retry loops skip re-encoding.
+    high_res keeps the original resolution (still JPEG-encoded) for tasks
+    where fine on-screen text must survive, at full image-token cost.
+    """
+    max_side = 0 if high_res else MAX_UPLOAD_IMAGE_SIDE
+    return _encode_screenshot_cached(path, os.path.getmtime(path), max_side)
+
+
+# Small pool for overlapping screenshot read/encode with prompt building;
+# two workers cover the read plus one straggler without thread churn
+_IO_POOL = ThreadPoolExecutor(max_workers=2)
+
+# Lazily-forked process pool so many concurrent async analyses decode and
+# re-encode screenshots across cores instead of queueing on one GIL
+_PREPROC_POOL: Optional[ProcessPoolExecutor] = None
+
+
+def _preproc_pool() -> ProcessPoolExecutor:
+    global _PREPROC_POOL
+    if _PREPROC_POOL is None:
+        _PREPROC_POOL = ProcessPoolExecutor(
+            max_workers=(os.cpu_count() or 2) // 2 or 1
+        )
+    return _PREPROC_POOL
+
+
+@lru_cache(maxsize=8)
+def _shared_client(api_key: str) -> genai.Client:
+    """
+    One genai.Client per API key, shared across all GeminiAgent instances.
+
+    The client is thread-safe and multiplexes parallel requests over a
+    single HTTP/2 connection pool, so sharing it avoids a fresh TCP/TLS
+    handshake (and extra idle sockets) for every agent constructed. The
+    explicit timeout keeps a wedged request from pinning its stream (and
+    callers) indefinitely.
+    """
+    return genai.Client(
+        api_key=api_key,
+        http_options=types.HttpOptions(timeout=30_000),
+    )
+
+
+class _AsyncTokenBucket:
+    """
+    Client-side request rate limiter for the async Gemini paths.
+
+    A burst of gathered calls can trip the server's per-minute quota and
+    stall the whole batch on retry-after backoff; paying a few
+    milliseconds here to smooth submissions is far cheaper than eating a
+    429. A 1 ms floor between submissions additionally spreads
+    micro-bursts that the token bucket alone would let through.
+    """
+
+    _MIN_INTERVAL = 0.001
+
+    def __init__(self, rate: float, capacity: int) -> None:
+        self._rate = rate
+        self._capacity = float(capacity)
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._last_send = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        """Wait until one request token (and the submission floor) is free."""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(
+                    self._capacity,
+                    self._tokens + (now - self._updated) * self._rate,
+                )
+                self._updated = now
+                wait = 0.0
+                if self._tokens < 1.0:
+                    wait = (1.0 - self._tokens) / self._rate
+                since_last = now - self._last_send
+                if since_last < self._MIN_INTERVAL:
+                    wait = max(wait, self._MIN_INTERVAL - since_last)
+                if wait <= 0.0:
+                    self._tokens -= 1.0
+                    self._last_send = now
+                    return
+                await asyncio.sleep(wait)
+
+
+# Signal phrases scanned for in every model text response. Compiled into a
+# single alternation so classification is one C-level DFA pass per turn
+# instead of one Python substring scan per phrase.
+_LABEL_PATTERNS: Dict[str, str] = {
+    "subgoal_complete": r"sub-?goal complete",
+    "subgoal_impossible": r"sub-?goal impossible",
+    "task_complete": (
+        r"task complete|successfully completed|finished|done|accomplished"
+    ),
+}
+_LABEL_RE = re.compile(
+    "|".join(f"(?P<{label}>{pattern})" for label, pattern in _LABEL_PATTERNS.items()),
+    re.IGNORECASE,
+)
+
+
+def _finish_reason_name(reason: Any) -> str:
+    """
+    Copy a finish reason out as a plain string.
+
+    Storing the SDK enum member would keep a reference chain back into the
+    full response object (screenshot bytes included), pinning it in memory
+    for as long as the result lives in conversation history.
+    """
+    return getattr(reason, "name", None) or str(reason)
+
+
+def classify_response(text: str) -> set:
+    """
+    Classify a model text response into signal labels in a single scan.
+
+    Returns any of {'subgoal_complete', 'subgoal_impossible',
+    'task_complete'} whose phrases occur in the text.
+    """
+    return {m.lastgroup for m in _LABEL_RE.finditer(text)}
 
 
 class GeminiAgentError(Exception):
@@ -19,6 +281,36 @@ class GeminiAgentError(Exception):
     pass
 
 
+@dataclass
+class PlanStep:
+    """
+    Single node in the execution DAG derived from a Gemini response.
+
+    Steps whose dependencies are satisfied may be dispatched concurrently
+    by the caller (LLMCompiler-style planner/executor split).
+    """
+    id: int
+    name: str
+    args: Dict[str, Any]
+    deps: List[int] = field(default_factory=list)
+
+
+@dataclass(slots=True)
+class AnalyzeResult:
+    """
+    Parsed Gemini action response.
+
+    Slotted dataclass instead of a per-call dict: attribute access is a
+    C-level slot load and per-object memory stays flat across thousands
+    of evaluation turns.
+    """
+    text_response: str = ""
+    function_calls: List[Dict[str, Any]] = field(default_factory=list)
+    finish_reason: str = "UNKNOWN"
+    plan: List[PlanStep] = field(default_factory=list)
+    labels: set = field(default_factory=set)
+
+
 class GeminiAgent:
     """
     Autonomous AI agent using Google Gemini with function calling.
@@ -32,99 +324,376 @@ class GeminiAgent:
         tools: List of function declarations for tool calling.
     """
     
-    # System instruction that defines the agent's behavior
-    SYSTEM_INSTRUCTION = r"""You are an expert AI Agent capable of controlling a Windows PC.
-
-**ZERO STATE RULE (HIGHEST PRIORITY):**
-- If the user asks for a website (Instagram, YouTube, Google, etc.) AND you clearly see the Desktop (wallpaper, icons, empty screen):
-  **IMMEDIATELY** execute the 'Open Chrome' sequence.
-- If you see the Desktop but the task requires an app (e.g., "open notepad"), launch it via Win+R or Start Menu.
-- **NEVER** return an empty response. If confused, default to opening the required application.
-
-CORE OPERATING RULES:
-1. **CHAINING COMMANDS (MANDATORY):**
-   - EFFICIENCY IS KEY. Never perform a single action if you can chain them.
-   - Example: Multiple actions in ONE response.
-
-2. **OPENING CHROME WITH ACCESSIBILITY (CRITICAL):**
-   - **NEVER** open Chrome via Start Menu search.
-   - **ALWAYS** use this exact sequence (ALL IN ONE RESPONSE):
-     1. `hotkey(['win', 'r'])` to open Run dialog.
-     2. `type_text('chrome --force-renderer-accessibility --remote-debugging-port=9222')`.
-     3. `press_key('enter')`.
-     4. `wait(seconds=6)` <- MANDATORY.
-   - **WHY remote-debugging-port?** Enables Playwright to connect for precise web automation via CSS selectors.
-
-3. **APP-SPECIFIC STRATEGIES (PRIORITY):**
-
-   **A. WEB BROWSERS (CHROME/EDGE) - NAVIGATION LOOP PREVENTION:**
-   - **RULE:** Only use the Address Bar (EditControl 'Barra de endereço') if the current window title DOES NOT match your target website.
-   - **ONCE REACHED:** If the window title contains the site name (e.g., "Instagram"), STOP using the Address Bar IDs (usually ID 7, 8 or any Edit with Y < 100).
-   - **MANDATORY EXPLORATION:** As soon as a website loads, you MUST call `web_get_elements()` FIRST to discover CSS selectors. You cannot use web_click or web_type effectively without this.
-
-   **B. PLAYWRIGHT WEB AUTOMATION (HIGHEST PRECISION):**
-   - **When to use:** If Chrome is running AND you're interacting with a WEB PAGE.
-   - **CRITICAL PRIORITY ORDER:**
-     1. **FIRST CHOICE (MANDATORY):** Always use `web_click(selector)` and `web_type(selector, text)` for any interaction inside the website content.
-     2. **SECOND CHOICE:** If web tools fail or you are stuck, use `click_element_by_id` from the UI Scanner list.
-     3. **LAST RESORT:** Use coordinate clicking.
-
-   **C. FILE EXPLORER (SEARCHING):**
-   - Identify the Search box, call `click_element_by_id(id)` on it FIRST, then chain `type_text("query", press_enter=True)`.
-
-   **D. FILE PICKER / UPLOAD DIALOGS:**
-   - DO NOT navigate folders. Identify the "File name" Edit box, click it, and type the FULL absolute path (e.g., "C:\Users\Name\file.jpg") then press Enter.
-
-4. **INPUT FIELD DISAMBIGUATION (CRITICAL):**
-   - Website content elements (chat boxes, search fields) are positioned in the central/lower area of the screen.
-   - Browser UI elements (Address bar, tabs) are at the very top (Y < 100).
-   - **NEVER** type a search query into the Address Bar if you are already on the target website.
-
-5. **REASONING BEFORE ACTING (ReAct Pattern - MANDATORY):**
-   - **CRITICAL:** You MUST output your reasoning in a `thought` block BEFORE calling functions.
-   - Describe: (1) What you see, (2) Current status, (3) Why these specific actions, (4) Expected outcome.
-   - **Self-Correction:** If HISTORY shows the same action failed or state didn't change, try a DIFFERENT strategy (e.g., switch from ID to `web_click` or use a keyboard shortcut like `/`).
-
-6. **HIERARCHICAL PLANNING:**
-   - Focus ONLY on the "CURRENT SUB-GOAL".
-   - **Transition:** If the sub-goal is complete, state 'SUB-GOAL COMPLETE' AND **immediately provide the function call(s) for the next sub-goal** in the same response.
-   - NEVER return an empty list of functions if pending sub-goals exist.
-
-RESPONSE FORMAT:
-- Start with a clear thought statement.
-- Follow with a list of function calls.
-- Example: "I have reached Instagram. Sub-goal 2 is complete. Now starting sub-goal 3: searching. I will call web_get_elements to find the search field selector."
+    # Tight system instruction: rules only. Worked examples live in the
+    # few-shot history below so they are sent (and cached) once per
+    # session instead of re-prefilled with every request.
+    SYSTEM_INSTRUCTION = r"""You are an expert AI Agent controlling a Windows PC.
+
+RULES:
+1. CHAIN actions: emit every safe function call in ONE response, never a single action at a time. Start each response with ONE short sentence of reasoning (what you see, why these actions), then the calls - never elaborate further. Never return an empty response.
+2. If the screen shows the bare Desktop and the task needs an app or website, launch it immediately (Chrome for websites, Win+R/Start Menu for apps).
+3. Open Chrome ONLY via Win+R: type_text('chrome --force-renderer-accessibility --remote-debugging-port=9222'), press enter, then wait(seconds=6). Never via Start Menu search. The debug port lets Playwright drive the page precisely.
+4. On a loaded web page, call web_get_elements() FIRST, then prefer web_click/web_type with its CSS selectors; fall back to click_element_by_id, and use raw coordinates only as a last resort.
+5. Use the Address Bar only while the window title does NOT match the target site; once on the site, never type into it again (its IDs sit at Y < 100; page content is central/lower).
+6. File Explorer search: click the Search box by ID, then type_text(query, press_enter=True). File picker/upload dialogs: click the 'File name' box and type the FULL absolute path; never browse folders.
+7. Self-correct: if HISTORY shows the same action failed or the state did not change, switch strategy (different tool, keyboard shortcut, etc.).
+8. Focus ONLY on the CURRENT SUB-GOAL. When it is done, state 'SUB-GOAL COMPLETE' and immediately chain the next sub-goal's calls; if it cannot be done, state 'SUB-GOAL IMPOSSIBLE: [reason]'.
+
+HISTORY ENCODING: prior actions may arrive as compact records separated by 0x1E, fields (name/args/result) by 0x1F. Names: mm=move_mouse, ck=click_element, ci=click_element_by_id, tt=type_text, sc=scroll, pk=press_key, hk=hotkey, wt=wait, wc=web_click, wy=web_type, we=web_get_elements.
 """
 
+    # One-shot exchange demonstrating the Chrome-launch sequence and the
+    # thought-then-calls response format; prepended once per session so the
+    # prefix KV cache absorbs it instead of every request re-paying it
+    _FEW_SHOT_HISTORY: ClassVar[List[types.Content]] = [
+        types.Content(role="user", parts=[types.Part.from_text(
+            text="USER REQUEST: Open Instagram. (The screenshot shows the bare Windows desktop.)"
+        )]),
+        types.Content(role="model", parts=[types.Part.from_text(
+            text=(
+                "I see the bare Desktop and the task needs a website, so I launch Chrome "
+                "with accessibility and remote debugging, then wait for it to load - all "
+                "chained in one response: hotkey(['win', 'r']), type_text('chrome "
+                "--force-renderer-accessibility --remote-debugging-port=9222'), "
+                "press_key('enter'), wait(seconds=6). Once Instagram loads I will call "
+                "web_get_elements() before any web_click/web_type."
+            )
+        )]),
+    ]
+
     def __init__(
         self,
         model_name: str = "gemini-2.0-flash-exp",
         api_key: Optional[str] = None,
-        logger: Optional[TaskLogger] = None
+        logger: Optional[TaskLogger] = None,
+        use_stateless: bool = False,
+        qpm: int = 500
     ) -> None:
         """
         Initialize the Gemini agent with function calling capabilities.
+
+        By default a stateful chat session is used so conversation history
+        is kept server-side (prefix KV reuse) instead of being re-sent and
+        re-prefilled on every turn. Pass use_stateless=True to force the
+        old behavior of embedding history in each prompt.
         """
-        self.api_key = api_key or os.getenv("GOOGLE_API_KEY")
-        if not self.api_key:
+        api_key = api_key or os.getenv("GOOGLE_API_KEY")
+        if not api_key:
             raise GeminiAgentError(
                 "Google API key not found. Set GOOGLE_API_KEY environment variable."
             )
-        
+
         self.logger = logger
-        
+
         try:
-            self.client = genai.Client(api_key=self.api_key)
+            # Shared per-key client: do not close it from any single agent
+            self.client = _shared_client(api_key)
             self.model_name = model_name
             self.tools = self._define_tools()
-            
+            self.use_stateless = use_stateless
+            self._chat_config = self._shared_chat_config()
+
+            # Set by the warmup thread when the model supports explicit
+            # context caching of the shared prompt prefix
+            self._cached_content_name: Optional[str] = None
+            self._cached_action_config: Optional[types.GenerateContentConfig] = None
+            self._chat = None if use_stateless else self._create_chat_session()
+
+            # Dedup cache: skip the Gemini round-trip entirely when the
+            # screenshot bytes and user request match the previous call
+            self._last_analysis_key: Optional[Tuple[bytes, str]] = None
+            self._last_analysis_result: Optional[AnalyzeResult] = None
+
+            # LRU of generated plans keyed on the normalized request, so
+            # repeating a task skips the planning round-trip
+            self._plan_cache: "OrderedDict[str, List[str]]" = OrderedDict()
+
+            # Content-addressed upload cache: hash of encoded screenshot
+            # bytes -> Files API handle (None while an upload is in flight)
+            self._image_cache: "OrderedDict[bytes, Optional[types.File]]" = OrderedDict()
+
+            # Per-turn rendered history fragments (turns are immutable
+            # once executed, so each is stringified at most once)
+            self._history_render_cache: Dict[int, str] = {}
+
+            # Bounds in-flight async calls so gathered batches respect
+            # the Gemini requests-per-minute budget; tunable per
+            # deployment since quota tiers differ
+            self._aio_sem = asyncio.Semaphore(
+                int(os.getenv("GEMINI_MAX_CONCURRENCY", "6"))
+            )
+
+            # Smooths submission bursts under the quota so gathered
+            # batches do not trade their speedup for 429 backoff stalls
+            self._rate_bucket = _AsyncTokenBucket(
+                rate=qpm / 60.0, capacity=max(1, qpm // 10)
+            )
+
+            # Warm the transport off the critical path: a tiny count_tokens
+            # call pays the connection setup and auth exchange now instead
+            # of on the user's first real request. GEMINI_WARMUP=0 skips it
+            # (e.g. for tests that stub the client).
+            if os.getenv("GEMINI_WARMUP", "1") == "1":
+                threading.Thread(target=self._warm_client, daemon=True).start()
+
         except Exception as e:
             raise GeminiAgentError(f"Failed to initialize Gemini client: {e}")
+
+    def _warm_client(self) -> None:
+        """Best-effort transport warmup; failures only cost the warm start."""
+        try:
+            self.client.models.count_tokens(model=self.model_name, contents="hi")
+        except Exception:
+            pass
+
+        # Try to pin the shared prefix (instruction + tools + few-shot)
+        # server-side so stateless calls stop re-sending and re-tokenizing
+        # it. Not all models support explicit caching; inline fallback
+        # stays in place when this fails.
+        try:
+            cached = self.client.caches.create(
+                model=self.model_name,
+                config=types.CreateCachedContentConfig(
+                    system_instruction=self.SYSTEM_INSTRUCTION,
+                    tools=self.tools,
+                    contents=list(self._FEW_SHOT_HISTORY),
+                    ttl="3600s",
+                ),
+            )
+            self._cached_content_name = cached.name
+        except Exception:
+            self._cached_content_name = None
+
+    def _invalidate_cached_prefix(self) -> None:
+        """Fall back to the inline prompt prefix (e.g. after cache expiry).
+
+        A stateful chat session bakes the cached_content reference into
+        its config, so it must be rebuilt too - otherwise the retry goes
+        straight back through the expired cache and fails again. The
+        rebuilt session starts from the few-shot prefix; accumulated
+        turns are lost, which the next screenshot and history delta
+        compensate for.
+        """
+        self._cached_content_name = None
+        self._cached_action_config = None
+        if not self.use_stateless:
+            self._chat = self._create_chat_session()
+
+    def _stateless_contents(
+        self,
+        image_data: bytes,
+        full_prompt: str
+    ) -> List[types.Content]:
+        """
+        Assemble the contents list for a stateless analysis call.
+
+        The few-shot exchange is prepended inline unless it already lives
+        in server-side cached content.
+        """
+        contents = [] if self._cached_content_name else list(self._FEW_SHOT_HISTORY)
+        contents.append(types.Content(
+            role="user",
+            parts=[
+                self._get_image_part(image_data),
+                types.Part.from_text(text=full_prompt)
+            ]
+        ))
+        return contents
+
+    # Unique screenshots kept as Files API handles before LRU eviction
+    _IMAGE_CACHE_CAP: ClassVar[int] = 32
+
+    # Above this size, inline base64 inflation (~1.33x) outweighs the
+    # extra upload round-trip - block on the Files API instead
+    _INLINE_BYTES_MAX: ClassVar[int] = 512 * 1024
+
+    def _get_image_part(self, image_data: bytes) -> types.Part:
+        """
+        Build the screenshot Part, reusing an uploaded File when possible.
+
+        First sight of a given image sends the bytes inline (no extra
+        round-trip on the critical path) and starts a background Files API
+        upload; later calls carrying the same content send only the file
+        URI - a few dozen bytes instead of the full JPEG. Oversized frames
+        wait for the upload up front so the generate request never carries
+        a multi-hundred-KB base64 payload.
+        """
+        key = _content_hash(image_data)
+        cached = self._image_cache.get(key)
+        if cached is not None:
+            self._image_cache.move_to_end(key)
+            return types.Part.from_uri(file_uri=cached.uri, mime_type="image/jpeg")
+        if key not in self._image_cache:
+            # Reserve the slot so concurrent calls upload each image once
+            self._image_cache[key] = None
+            future = _IO_POOL.submit(self._upload_image, key, image_data)
+            while len(self._image_cache) > self._IMAGE_CACHE_CAP:
+                self._image_cache.popitem(last=False)
+            if len(image_data) > self._INLINE_BYTES_MAX:
+                future.result()
+                cached = self._image_cache.get(key)
+                if cached is not None:
+                    return types.Part.from_uri(
+                        file_uri=cached.uri, mime_type="image/jpeg"
+                    )
+        return types.Part.from_bytes(data=image_data, mime_type="image/jpeg")
+
+    def purge_uploads(self) -> None:
+        """
+        Delete the Files API handles accumulated during a trajectory.
+
+        Deletion happens on the I/O pool so callers never wait on it;
+        failures are ignored (server-side TTL reaps leftovers anyway).
+        """
+        handles = [f for f in self._image_cache.values() if f is not None]
+        self._image_cache.clear()
+
+        def delete_all():
+            for handle in handles:
+                try:
+                    self.client.files.delete(name=handle.name)
+                except Exception:
+                    pass
+
+        if handles:
+            _IO_POOL.submit(delete_all)
+
+    def _upload_image(self, key: bytes, image_data: bytes) -> None:
+        """Background Files API upload feeding _get_image_part's cache."""
+        try:
+            uploaded = self.client.files.upload(
+                file=io.BytesIO(image_data),
+                config=types.UploadFileConfig(mime_type="image/jpeg"),
+            )
+        except Exception:
+            self._image_cache.pop(key, None)
+            return
+        if key in self._image_cache:
+            self._image_cache[key] = uploaded
+
+    def _action_config(
+        self,
+        system_instruction: Optional[str] = None,
+        max_output_tokens: int = 256
+    ) -> types.GenerateContentConfig:
+        """
+        Build the shared generation config for action analysis calls.
+
+        Caps the decode phase (decode time is linear in generated tokens,
+        and a thought plus a handful of function calls fits well under 256)
+        and pins a single candidate, so worst-case latency and cost stay
+        bounded without changing typical responses. The default config is
+        constructed and validated once per process (instruction and tools
+        are class constants) and reused verbatim, so per-call overhead
+        stays at an attribute lookup instead of re-validating every
+        FunctionDeclaration schema for every agent instance.
+        """
+        if system_instruction is None and max_output_tokens == 256:
+            if self._cached_content_name is not None:
+                # Instruction, tools and few-shot live server-side; only
+                # the cache reference travels with each call
+                if self._cached_action_config is None:
+                    self._cached_action_config = types.GenerateContentConfig(
+                        cached_content=self._cached_content_name,
+                        temperature=0.1,
+                        max_output_tokens=max_output_tokens,
+                        candidate_count=1,
+                        stop_sequences=["\n\nUSER"],
+                    )
+                return self._cached_action_config
+            if GeminiAgent._DEFAULT_ACTION_CONFIG is None:
+                GeminiAgent._DEFAULT_ACTION_CONFIG = self._action_config(
+                    self.SYSTEM_INSTRUCTION, 256
+                )
+            return GeminiAgent._DEFAULT_ACTION_CONFIG
+        return types.GenerateContentConfig(
+            system_instruction=system_instruction or self.SYSTEM_INSTRUCTION,
+            tools=self.tools,
+            temperature=0.1,
+            max_output_tokens=max_output_tokens,
+            candidate_count=1,
+            stop_sequences=["\n\nUSER"],
+        )
+
+    def _create_chat_session(self):
+        """Create a stateful chat session with the standard action config."""
+        config = self._action_config()
+        history = [] if config.cached_content else list(self._FEW_SHOT_HISTORY)
+        return self.client.chats.create(
+            model=self.model_name,
+            history=history,
+            config=config
+        )
+
+    def reset_session(self) -> None:
+        """
+        Discard accumulated chat state and start a fresh session.
+
+        Call this when a task completes so the next task does not pay
+        prefill (or confusion) for the previous task's history.
+        """
+        if not self.use_stateless:
+            self._chat = self._create_chat_session()
     
-    def _define_tools(self) -> List[types.Tool]:
+    # Cached tool declarations shared by all instances (built once, lazily)
+    _TOOLS: ClassVar[Optional[List[types.Tool]]] = None
+
+    # Pre-validated configs shared across agent instances: the instruction
+    # and tool schemas are class constants, so multi-agent setups pay the
+    # construction and schema validation once per process, not per agent
+    _DEFAULT_ACTION_CONFIG: ClassVar[Optional[types.GenerateContentConfig]] = None
+    _CHAT_CONFIG: ClassVar[Optional[types.GenerateContentConfig]] = None
+
+    @classmethod
+    def _shared_chat_config(cls) -> types.GenerateContentConfig:
+        """Return the process-wide config for free-form chat calls."""
+        if cls._CHAT_CONFIG is None:
+            cls._CHAT_CONFIG = types.GenerateContentConfig(
+                system_instruction=cls.SYSTEM_INSTRUCTION, temperature=0.7
+            )
+        return cls._CHAT_CONFIG
+
+    # Tools that only observe state (no mouse/keyboard input, no focus
+    # change) - later steps in a plan do not need to wait for them
+    READ_ONLY_TOOLS: ClassVar[frozenset] = frozenset({"web_get_elements"})
+
+    @classmethod
+    def build_execution_plan(cls, function_calls: List[Dict[str, Any]]) -> List[PlanStep]:
+        """
+        Assign dependencies to a list of function calls, producing a small DAG.
+
+        Input-injecting actions (clicks, typing, hotkeys, waits) share the
+        mouse/keyboard and window focus, so each depends on the previous
+        input step. Read-only tools like web_get_elements depend on the
+        state produced so far but never block the steps after them, letting
+        an executor overlap their latency with continued input actions.
+
+        Args:
+            function_calls: List of {'name', 'args'} dicts from Gemini.
+
+        Returns:
+            List of PlanStep objects in original order with deps filled in.
+        """
+        plan = []
+        last_input_step: Optional[int] = None
+        for i, call in enumerate(function_calls):
+            deps = [] if last_input_step is None else [last_input_step]
+            plan.append(PlanStep(id=i, name=call["name"], args=call["args"], deps=deps))
+            if call["name"] not in cls.READ_ONLY_TOOLS:
+                last_input_step = i
+        return plan
+
+    @classmethod
+    def _define_tools(cls) -> List[types.Tool]:
         """
         Define function calling tools mapping to DesktopController and Playwright methods.
+
+        The declarations are a compile-time constant, so they are built once
+        and cached at class level; the SDK only serializes them, never
+        mutates them, so sharing across instances is safe.
         """
+        if cls._TOOLS is not None:
+            return cls._TOOLS
         # --- Standard Desktop Tools ---
         move_mouse_declaration = types.FunctionDeclaration(
             name="move_mouse",
@@ -289,13 +858,63 @@ RESPONSE FORMAT:
                 web_get_elements_declaration
             ]
         )
-        
-        return [tool]
+
+        cls._TOOLS = [tool]
+        return cls._TOOLS
+
+    _PLAN_CACHE_CAP: ClassVar[int] = 128
+
+    # Matches one numbered sub-goal line ("1. ...", "2) ...", "Step 3: ...")
+    # in a single C-level pass instead of per-prefix startswith scans
+    _PLAN_LINE_RE: ClassVar[re.Pattern] = re.compile(
+        r"^(?:Step\s+)?(\d{1,2})[.):]\s*(.+)$", re.IGNORECASE
+    )
+
+    # Planning config: greedy decoding makes identical requests produce
+    # identical plans (so the plan LRU actually hits), and the token cap
+    # bounds decode time - a plan is well under 256 tokens
+    _PLAN_CONFIG: ClassVar[types.GenerateContentConfig] = types.GenerateContentConfig(
+        temperature=0.0,
+        max_output_tokens=256,
+        candidate_count=1,
+    )
+
+    @staticmethod
+    def _plan_cache_key(user_request: str) -> str:
+        """Normalized request hash: trivial rephrasings share one entry."""
+        normalized = " ".join(user_request.strip().lower().split())
+        return _content_hash(normalized.encode("utf-8")).hex()
+
+    def _plan_cache_get(self, key: str) -> Optional[List[str]]:
+        """Return a cached plan (refreshing its LRU position) or None."""
+        plan = self._plan_cache.get(key)
+        if plan is not None:
+            self._plan_cache.move_to_end(key)
+            return list(plan)
+        return None
+
+    def _plan_cache_put(self, key: str, plan: List[str]) -> None:
+        """Store a plan, evicting the least recently used entry at cap."""
+        self._plan_cache[key] = list(plan)
+        self._plan_cache.move_to_end(key)
+        while len(self._plan_cache) > self._PLAN_CACHE_CAP:
+            self._plan_cache.popitem(last=False)
 
     def generate_plan(self, user_request: str, screenshot_path: Optional[str] = None) -> List[str]:
         """
         Decomposes a complex user request into a numbered list of sub-goals.
+
+        Plans for identically-phrased requests (modulo case and spacing)
+        are served from an in-process LRU cache, skipping the round-trip.
         """
+        cache_key = self._plan_cache_key(user_request)
+        cached = self._plan_cache_get(cache_key)
+        if cached is not None:
+            if self.logger:
+                self.logger.log_data(
+                    "GENERATED PLAN (CACHED)", {"plan": cached}, format_json=True
+                )
+            return cached
         try:
             planning_prompt = f"""Break down the following task into sequential sub-goals.
 Output ONLY a numbered list (1., 2., ...).
@@ -303,25 +922,98 @@ TASK: {user_request}"""
             
             parts = [types.Part.from_text(text=planning_prompt)]
             if screenshot_path:
-                with open(screenshot_path, "rb") as f:
-                    image_data = f.read()
-                parts.insert(0, types.Part.from_bytes(data=image_data, mime_type="image/png"))
+                image_data = encode_screenshot(screenshot_path)
+                parts.insert(0, self._get_image_part(image_data))
             
             response = self.client.models.generate_content(
                 model=self.model_name,
                 contents=[types.Content(role="user", parts=parts)],
-                config=types.GenerateContentConfig(temperature=0.3)
+                config=self._PLAN_CONFIG
             )
             
             plan = []
             for line in response.text.split('\n'):
-                line = line.strip()
-                if any(line.startswith(f"{i}.") for i in range(1, 20)):
-                    clean_line = line.split('.', 1)[1].strip()
-                    plan.append(clean_line)
-            
+                match = self._PLAN_LINE_RE.match(line.strip())
+                if match:
+                    plan.append(match.group(2).strip())
+
+            if self.logger:
+                self.logger.log_data("GENERATED PLAN", {"plan": plan}, format_json=True)
+            if plan:
+                self._plan_cache_put(cache_key, plan)
+            return plan if plan else [user_request]
+        except Exception:
+            return [user_request]
+
+    async def _generate_async(
+        self,
+        contents: Any,
+        config: types.GenerateContentConfig
+    ) -> Any:
+        """
+        Send one async generate_content call under the concurrency and
+        rate limits, retrying quota rejections.
+
+        A 429 means the server-side minute budget is exhausted despite the
+        client-side bucket (e.g. several agent processes sharing a key);
+        abandoning the call would waste everything already in flight, so
+        back off exponentially with jitter for up to three attempts before
+        surfacing the error.
+        """
+        for attempt in range(3):
+            async with self._aio_sem:
+                await self._rate_bucket.acquire()
+                try:
+                    return await self.client.aio.models.generate_content(
+                        model=self.model_name,
+                        contents=contents,
+                        config=config
+                    )
+                except genai_errors.APIError as e:
+                    if getattr(e, "code", None) != 429 or attempt == 2:
+                        raise
+            await asyncio.sleep((2 ** attempt) + random.random())
+
+    async def generate_plan_async(
+        self,
+        user_request: str,
+        screenshot_path: Optional[str] = None
+    ) -> List[str]:
+        """
+        Async variant of generate_plan, gatherable alongside other calls.
+        """
+        cache_key = self._plan_cache_key(user_request)
+        cached = self._plan_cache_get(cache_key)
+        if cached is not None:
+            if self.logger:
+                self.logger.log_data(
+                    "GENERATED PLAN (CACHED)", {"plan": cached}, format_json=True
+                )
+            return cached
+        try:
+            planning_prompt = f"""Break down the following task into sequential sub-goals.
+Output ONLY a numbered list (1., 2., ...).
+TASK: {user_request}"""
+
+            parts = [types.Part.from_text(text=planning_prompt)]
+            if screenshot_path:
+                image_data = await asyncio.to_thread(encode_screenshot, screenshot_path)
+                parts.insert(0, self._get_image_part(image_data))
+
+            response = await self._generate_async(
+                [types.Content(role="user", parts=parts)], self._PLAN_CONFIG
+            )
+
+            plan = []
+            for line in response.text.split('\n'):
+                match = self._PLAN_LINE_RE.match(line.strip())
+                if match:
+                    plan.append(match.group(2).strip())
+
             if self.logger:
                 self.logger.log_data("GENERATED PLAN", {"plan": plan}, format_json=True)
+            if plan:
+                self._plan_cache_put(cache_key, plan)
             return plan if plan else [user_request]
         except Exception:
             return [user_request]
@@ -331,75 +1023,629 @@ TASK: {user_request}"""
         user_request: str,
         screenshot_path: str,
         chat_history: Optional[List[Dict[str, Any]]] = None,
-        detected_elements: Optional[List[Dict[str, Any]]] = None
-    ) -> Dict[str, Any]:
+        detected_elements: Optional[List[Dict[str, Any]]] = None,
+        use_cache: bool = True
+    ) -> AnalyzeResult:
         """
         Sends the screenshot and context to Gemini to determine the next set of actions.
+
+        With use_cache, byte-identical (screenshot, request, model) inputs
+        replay the stored response from the on-disk cache - no network
+        call, which is the common case in debugging and replay loops.
+        Replay only applies in stateless mode: a stateful session must see
+        every turn, or its server-side history diverges from the actions
+        actually executed and self-correction reasons over a gapped past.
         """
         try:
-            with open(screenshot_path, "rb") as f:
-                image_data = f.read()
-            
-            context_str = ""
-            if detected_elements:
-                context_str += "DETECTED UI ELEMENTS (Set-of-Marks):\n"
-                for el in detected_elements[:50]: 
-                    context_str += f"[{el['id']}] {el['type']} '{el.get('name', 'Unknown')}'\n"
-                context_str += "-" * 40 + "\n\n"
-            
-            if chat_history:
-                context_str += "HISTORY OF PREVIOUS ACTIONS:\n"
-                for turn in chat_history[-5:]:
-                    if turn.get('function_calls'):
-                        for call in turn['function_calls']:
-                            context_str += f"- Action: {call['name']} args={call['args']}\n"
-                    if turn.get('execution_results'):
-                        for result in turn['execution_results']:
-                             context_str += f"  Result: {result}\n"
-                context_str += "-" * 40 + "\n\n"
+            # Unambiguous keystroke-style requests skip the model entirely.
+            # First turn only: once the keystroke has run, repeating it on
+            # every later iteration would be wrong, and follow-up turns
+            # must flow through the real session
+            if not chat_history:
+                fast = self._fast_route(user_request)
+                if fast is not None:
+                    return fast
+
+            # Screenshot read/encode is blocking I/O and independent of
+            # prompt construction - overlap the two, then join
+            image_future = _IO_POOL.submit(encode_screenshot, screenshot_path)
+            if self._chat is not None:
+                # Stateful session: the server holds the model's own prior
+                # turns but never sees tool outcomes, so the last turn's
+                # execution results ride along in the delta - without them
+                # failure messages ('Element ID 5 not found', 'Web click
+                # failed') are invisible and self-correction cannot fire
+                last_turn = chat_history[-1:] if chat_history else None
+                full_prompt = self._build_action_prompt(
+                    user_request, last_turn, detected_elements
+                )
+            else:
+                full_prompt = self._build_action_prompt(user_request, chat_history, detected_elements)
+            image_data = image_future.result()
+
+            # Consecutive identical screenshot + request: reuse the previous
+            # response instead of paying another full round-trip
+            # (stateless only - a stateful session must record every turn)
+            cache_key = (_content_hash(image_data), user_request)
+            if (
+                self._chat is None
+                and cache_key == self._last_analysis_key
+                and self._last_analysis_result is not None
+            ):
+                if self.logger:
+                    self.logger.log_step(
+                        "Analysis Cache Hit",
+                        "Screenshot and request unchanged - reusing previous response"
+                    )
+                return copy.deepcopy(self._last_analysis_result)
+
+            disk_key = None
+            last_turn = chat_history[-1] if chat_history else None
+            last_turn_failed = last_turn is not None and any(
+                "error" in str(r).lower()
+                for r in (last_turn.get("execution_results") or [])
+            )
+            # A failed previous action means the frame may not reflect the
+            # intended state - don't replay a stored response onto it
+            if use_cache and self._chat is None and not last_turn_failed:
+                history_blob = (
+                    self._encode_history_compact(chat_history[-5:])
+                    if chat_history else ""
+                )
+                disk_key = _content_hash(
+                    image_data + b"\0" + user_request.encode()
+                    + b"\0" + self.model_name.encode()
+                    + b"\0" + history_blob.encode()
+                ).hex()
+                cached = _response_cache_get(disk_key)
+                if cached is not None:
+                    if self.logger:
+                        self.logger.log_step(
+                            "Analysis Cache Hit (disk)",
+                            "Identical screenshot/request/model - replaying stored response"
+                        )
+                    return copy.deepcopy(cached)
+
+            if self._chat is not None:
+                if self.logger:
+                    self.logger.log_prompt(full_prompt, "SESSION_DELTA")
+
+                response = self._chat.send_message([
+                    self._get_image_part(image_data),
+                    types.Part.from_text(text=full_prompt)
+                ])
+            else:
+                if self.logger:
+                    self.logger.log_prompt(full_prompt, "FULL_CONTEXT")
+
+                response = self.client.models.generate_content(
+                    model=self.model_name,
+                    contents=self._stateless_contents(image_data, full_prompt),
+                    config=self._action_config()
+                )
+
+            result = self._parse_action_response(response)
+            self._last_analysis_key = cache_key
+            self._last_analysis_result = copy.deepcopy(result)
+            if disk_key is not None:
+                _response_cache_put(disk_key, result)
+            return result
+        except Exception as e:
+            if self._cached_content_name is not None:
+                # The server-side prefix cache may have passed its TTL;
+                # drop it and retry once with the inline prefix
+                self._invalidate_cached_prefix()
+                return self.analyze_and_act(
+                    user_request, screenshot_path, chat_history,
+                    detected_elements, use_cache
+                )
+            raise GeminiAgentError(f"Analysis failed: {e}")
+
+    async def analyze_and_act_async(
+        self,
+        user_request: str,
+        screenshot_path: str,
+        chat_history: Optional[List[Dict[str, Any]]] = None,
+        detected_elements: Optional[List[Dict[str, Any]]] = None
+    ) -> AnalyzeResult:
+        """
+        Async variant of analyze_and_act using the non-blocking Gemini client.
+
+        The process is network-bound during analysis, so a supervisor can
+        overlap several in-flight analyses with
+        asyncio.gather(*[agent.analyze_and_act_async(...) for ...]).
+        The screenshot read is pushed to a worker thread to keep the event
+        loop free.
+        """
+        try:
+            # CPU-bound decode/re-encode goes to the process pool so N
+            # concurrent analyses preprocess across cores, not one GIL
+            image_data = await asyncio.get_running_loop().run_in_executor(
+                _preproc_pool(), encode_screenshot, screenshot_path
+            )
 
-            full_prompt = context_str + "USER REQUEST: " + user_request
+            full_prompt = self._build_action_prompt(user_request, chat_history, detected_elements)
 
             if self.logger:
                 self.logger.log_prompt(full_prompt, "FULL_CONTEXT")
 
+            response = await self._generate_async(
+                self._stateless_contents(image_data, full_prompt),
+                self._action_config()
+            )
+
+            return self._parse_action_response(response)
+        except Exception as e:
+            raise GeminiAgentError(f"Analysis failed: {e}")
+
+    async def plan_and_act(
+        self,
+        user_request: str,
+        screenshot_path: str
+    ) -> Tuple[List[str], AnalyzeResult]:
+        """
+        Run planning and the first action analysis concurrently.
+
+        Planning costs a full Gemini round-trip; launching the first
+        analysis against the raw request at the same time roughly halves
+        time-to-first-action. The first sub-goal of a decomposed plan is
+        in practice the opening move of the raw request (launch the app /
+        site), so the optimistic first action stays valid; both calls
+        share the cached encoded screenshot so the disk read happens once.
+
+        Returns:
+            (plan, first_result) - the sub-goal list and the first turn's
+            AnalyzeResult.
+        """
+        plan, first_result = await asyncio.gather(
+            self.generate_plan_async(user_request, screenshot_path),
+            self.analyze_and_act_async(user_request, screenshot_path),
+        )
+        return plan, first_result
+
+    async def analyze_batch(
+        self,
+        requests: List[Tuple[str, str]]
+    ) -> List[AnalyzeResult]:
+        """
+        Analyze several (user_request, screenshot_path) pairs concurrently.
+
+        All analyses are in flight at once, so the batch completes in
+        roughly the slowest single round-trip instead of their sum.
+        """
+        return list(await asyncio.gather(
+            *[self.analyze_and_act_async(u, p) for u, p in requests]
+        ))
+
+    def analyze_and_act_stream(
+        self,
+        user_request: str,
+        screenshot_path: str,
+        chat_history: Optional[List[Dict[str, Any]]] = None,
+        detected_elements: Optional[List[Dict[str, Any]]] = None
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Streaming variant of analyze_and_act.
+
+        Yields each response part as soon as it closes instead of blocking
+        until the last decode token, so a pipelined caller can start
+        executing early function calls while the model is still emitting
+        later ones. Yields dicts carrying either a 'text' fragment or a
+        'function_call' ({'name', 'args'}).
+        """
+        try:
+            image_data = encode_screenshot(screenshot_path)
+
+            if self._chat is not None:
+                full_prompt = self._build_action_prompt(user_request, None, detected_elements)
+                if self.logger:
+                    self.logger.log_prompt(full_prompt, "SESSION_DELTA")
+                stream = self._chat.send_message_stream([
+                    self._get_image_part(image_data),
+                    types.Part.from_text(text=full_prompt)
+                ])
+            else:
+                full_prompt = self._build_action_prompt(user_request, chat_history, detected_elements)
+                if self.logger:
+                    self.logger.log_prompt(full_prompt, "FULL_CONTEXT")
+                stream = self.client.models.generate_content_stream(
+                    model=self.model_name,
+                    contents=self._stateless_contents(image_data, full_prompt),
+                    config=self._action_config()
+                )
+
+            finish_reason = "UNKNOWN"
+            for chunk in stream:
+                if not chunk.candidates:
+                    continue
+                if chunk.candidates[0].finish_reason:
+                    finish_reason = _finish_reason_name(chunk.candidates[0].finish_reason)
+                for part in chunk.candidates[0].content.parts or []:
+                    if part.text:
+                        yield {"text": part.text}
+                    elif part.function_call:
+                        yield {
+                            "function_call": {
+                                "name": part.function_call.name,
+                                "args": _function_call_args(part.function_call)
+                            }
+                        }
+            yield {"finish_reason": finish_reason}
+        except Exception as e:
+            raise GeminiAgentError(f"Streaming analysis failed: {e}")
+
+    def collect_stream(self, events: Iterator[Dict[str, Any]]) -> AnalyzeResult:
+        """
+        Aggregate analyze_and_act_stream events into one AnalyzeResult.
+
+        Lets callers that want the single-result shape still route through
+        the streaming path (and e.g. log deltas as they arrive).
+        """
+        result = AnalyzeResult()
+        text_parts = []
+        for event in events:
+            if "text" in event:
+                text_parts.append(event["text"])
+            elif "function_call" in event:
+                result.function_calls.append(event["function_call"])
+            elif "finish_reason" in event:
+                result.finish_reason = event["finish_reason"]
+        result.text_response = "".join(text_parts)
+        if self.logger:
+            self.logger.log_ai_response(self._loggable_result(result))
+        result.plan = self.build_execution_plan(result.function_calls)
+        result.labels = classify_response(result.text_response)
+        return result
+
+    @staticmethod
+    def _loggable_result(result: AnalyzeResult) -> Dict[str, Any]:
+        """JSON-safe view of an AnalyzeResult for the response log.
+
+        labels is a set, which json.dumps rejects - and log_data would
+        then silently degrade the whole entry to a one-line repr.
+        """
+        payload = asdict(result)
+        payload["labels"] = sorted(result.labels)
+        return payload
+
+    def _build_action_prompt(
+        self,
+        user_request: str,
+        chat_history: Optional[List[Dict[str, Any]]],
+        detected_elements: Optional[List[Dict[str, Any]]]
+    ) -> str:
+        """Build the full text prompt (context + user request) for analysis."""
+        # Collected as a parts list and joined once: linear-time assembly
+        # instead of quadratic repeated string concatenation. Ordering
+        # follows the static-prefix/dynamic-suffix rule for prompt caching:
+        # history is append-only (its prefix is stable turn over turn)
+        # while the element list and request change every frame, so they
+        # go last to keep the shared prefix as long as possible.
+        parts = []
+        if chat_history:
+            if os.getenv("AGENT_VERBOSE_HISTORY"):
+                # Debug fallback: human-readable per-action history
+                parts.append("HISTORY OF PREVIOUS ACTIONS:\n")
+                for turn in chat_history[-5:]:
+                    for call in turn.get('function_calls') or []:
+                        parts.append(f"- Action: {call['name']} args={call['args']}\n")
+                    for result in turn.get('execution_results') or []:
+                        parts.append(f"  Result: {result}\n")
+                parts.append(self._SECTION_SEP)
+            else:
+                parts.append("HISTORY (compact encoding):\n")
+                parts.append(self._render_history(chat_history) + "\n")
+                parts.append(self._SECTION_SEP)
+
+        if detected_elements:
+            # Scanners occasionally re-emit the same element; dedupe on the
+            # identity the model actually sees so the prompt (and its token
+            # cost) does not carry repeats. dict preserves first-seen order.
+            unique = {
+                (el.get('id'), el.get('type'), el.get('name')): el
+                for el in detected_elements
+            }
+            elements = list(unique.values())
+            if len(elements) > 50:
+                # Over budget: spend the 50 slots on the most relevant
+                # elements - names overlapping the request first, then
+                # text inputs, then top-of-screen order - instead of
+                # whatever order the scanner emitted
+                request_words = frozenset(
+                    re.findall(r"[a-z0-9]+", user_request.lower())
+                )
+
+                def priority(el: Dict[str, Any]) -> Tuple[int, int, int]:
+                    center = el.get('center') or (0, 0)
+                    name_words = re.findall(
+                        r"[a-z0-9]+", str(el.get('name') or '').lower()
+                    )
+                    overlap = sum(1 for w in name_words if w in request_words)
+                    return (
+                        -overlap,
+                        0 if el.get('type') == 'Edit' else 1,
+                        center[1],
+                    )
+                elements = sorted(elements, key=priority)[:50]
+            parts.append("DETECTED UI ELEMENTS (Set-of-Marks):\n")
+            parts.extend(
+                f"[{el['id']}] {el['type']} '{el.get('name', 'Unknown')}'\n"
+                for el in elements
+            )
+            parts.append(self._SECTION_SEP)
+
+        parts.append("USER REQUEST: ")
+        parts.append(user_request)
+        return "".join(parts)
+
+    # Prompt section divider, built once
+    _SECTION_SEP: ClassVar[str] = "-" * 40 + "\n\n"
+
+    # Abbreviated tool names for the compact history encoding (legend is
+    # included in SYSTEM_INSTRUCTION so the model can decode them)
+    _COMPACT_NAMES: ClassVar[Dict[str, str]] = {
+        "move_mouse": "mm",
+        "click_element": "ck",
+        "click_element_by_id": "ci",
+        "type_text": "tt",
+        "scroll": "sc",
+        "press_key": "pk",
+        "hotkey": "hk",
+        "wait": "wt",
+        "web_click": "wc",
+        "web_type": "wy",
+        "web_get_elements": "we",
+    }
+
+    _RECORD_SEP: ClassVar[str] = "\x1e"
+    _FIELD_SEP: ClassVar[str] = "\x1f"
+
+    def _render_history(self, chat_history: List[Dict[str, Any]]) -> str:
+        """
+        Render the last-5-turn history window with per-turn memoization.
+
+        Turn dicts are append-only and never mutated after execution, so
+        each is encoded exactly once; consecutive calls only pay for the
+        newest turn instead of re-stringifying the whole window.
+        """
+        records = []
+        for turn in chat_history[-5:]:
+            key = id(turn)
+            rendered = self._history_render_cache.get(key)
+            if rendered is None:
+                rendered = self._encode_history_compact([turn])
+                if len(self._history_render_cache) > 64:
+                    self._history_render_cache.clear()
+                self._history_render_cache[key] = rendered
+            if rendered:
+                records.append(rendered)
+        return self._RECORD_SEP.join(records)
+
+    @classmethod
+    def _encode_history_compact(cls, chat_history: List[Dict[str, Any]]) -> str:
+        """
+        Encode action history as a compact delimiter-separated token stream.
+
+        Emits one record per executed action (name<US>args<US>result) with
+        abbreviated tool names, cutting the history token count several-fold
+        compared to re-serializing full 'Action: ... args={...}' lines each
+        turn.
+        """
+        records = []
+        for turn in chat_history:
+            calls = turn.get('function_calls') or []
+            results = turn.get('execution_results') or []
+            for i, call in enumerate(calls):
+                name = cls._COMPACT_NAMES.get(call['name'], call['name'])
+                args = ",".join(f"{k}={v}" for k, v in call['args'].items())
+                result = results[i][:60] if i < len(results) else ""
+                records.append(name + cls._FIELD_SEP + args + cls._FIELD_SEP + result)
+        return cls._RECORD_SEP.join(records)
+
+    def _parse_action_response(self, response: Any) -> AnalyzeResult:
+        """Safely parse text and tool calls out of a Gemini response."""
+        result = AnalyzeResult()
+        if response.candidates:
+            result.finish_reason = _finish_reason_name(response.candidates[0].finish_reason)
+            parts = response.candidates[0].content.parts or []
+            result.text_response = "".join(p.text for p in parts if p.text)
+            result.function_calls = [
+                {"name": p.function_call.name, "args": _function_call_args(p.function_call)}
+                for p in parts if p.function_call
+            ]
+
+        if self.logger:
+            self.logger.log_ai_response(self._loggable_result(result))
+
+        # Dependency DAG over the returned calls for concurrent dispatch
+        result.plan = self.build_execution_plan(result.function_calls)
+        result.labels = classify_response(result.text_response)
+        return result
+
+    # Unambiguous requests that need no vision and no model: matched
+    # verbatim and mapped straight to a function call, skipping the
+    # screenshot upload and the whole Gemini round-trip
+    _FAST_RULES: ClassVar[List[Tuple[re.Pattern, Any]]] = [
+        (
+            re.compile(
+                r"^press\s+(enter|tab|esc(?:ape)?|space|backspace|delete"
+                r"|home|end|pageup|pagedown|up|down|left|right|f\d{1,2})$",
+                re.IGNORECASE,
+            ),
+            lambda m: {
+                "name": "press_key",
+                "args": {"key": "escape" if m.group(1).lower() == "esc"
+                         else m.group(1).lower()},
+            },
+        ),
+        (
+            re.compile(r"^press\s+(ctrl|alt|shift|win)\s*\+\s*(\w+)$", re.IGNORECASE),
+            lambda m: {
+                "name": "hotkey",
+                "args": {"keys": [m.group(1).lower(), m.group(2).lower()]},
+            },
+        ),
+        (
+            re.compile(r"^wait\s+(?:for\s+)?(\d+)\s*seconds?$", re.IGNORECASE),
+            lambda m: {"name": "wait", "args": {"seconds": int(m.group(1))}},
+        ),
+        (
+            re.compile(r"^scroll\s+(up|down)$", re.IGNORECASE),
+            lambda m: {
+                "name": "scroll",
+                "args": {"clicks": 3 if m.group(1).lower() == "up" else -3},
+            },
+        ),
+        (
+            re.compile(r'^type\s+"([^"]+)"$', re.IGNORECASE),
+            lambda m: {"name": "type_text", "args": {"text": m.group(1)}},
+        ),
+    ]
+
+    def _fast_route(self, user_request: str) -> Optional[AnalyzeResult]:
+        """Map an unambiguous request to a tool call without any model."""
+        stripped = user_request.strip()
+        for pattern, build in self._FAST_RULES:
+            match = pattern.match(stripped)
+            if match:
+                result = AnalyzeResult(
+                    text_response="[fast-route shortcut]",
+                    function_calls=[build(match)],
+                    finish_reason="STOP",
+                )
+                result.plan = self.build_execution_plan(result.function_calls)
+                # The single call fully satisfies the request, so the
+                # caller's loop can stop after executing it
+                result.labels = {"task_complete"}
+                if self.logger:
+                    self.logger.log_step(
+                        "Fast Route",
+                        f"Request matched a local rule - no Gemini call: {stripped}"
+                    )
+                return result
+        return None
+
+    # Header the model is asked to emit before each task's function calls
+    # in batch mode, e.g. "### TASK 2"
+    _TASK_HEADER_RE: ClassVar[re.Pattern] = re.compile(r"#+\s*TASK\s+(\d+)", re.IGNORECASE)
+
+    def analyze_and_act_batch(
+        self,
+        requests: List[Tuple[str, str]],
+        max_batch: int = 6
+    ) -> List[AnalyzeResult]:
+        """
+        Analyze several independent (user_request, screenshot_path) pairs in
+        a single Gemini call.
+
+        Marshals K screenshots and K task prompts into one request so the
+        network round-trip, prefill and rate-limit slot are amortized across
+        all of them. The model is instructed to group its function calls
+        under '### TASK <k>' headers, which are parsed back into one result
+        AnalyzeResult per task (same shape as analyze_and_act).
+
+        Args:
+            requests: List of (user_request, screenshot_path) tuples.
+            max_batch: Maximum tasks per Gemini call; longer lists are
+                processed in chunks of this size.
+
+        Returns:
+            List of AnalyzeResult objects, one per request, in input order.
+        """
+        if not requests:
+            return []
+
+        # Chunk oversized batches - throughput gains flatten past ~6 tasks
+        if len(requests) > max_batch:
+            results = []
+            for i in range(0, len(requests), max_batch):
+                results.extend(self.analyze_and_act_batch(requests[i:i + max_batch], max_batch))
+            return results
+
+        try:
+            # Each unique screenshot is sent once; tasks sharing a frame
+            # refer back to it. Image tokens dominate multimodal prefill,
+            # so a shared-frame batch pays for the image a single time.
+            parts = []
+            seen_frames: Dict[str, int] = {}
+            for k, (user_request, screenshot_path) in enumerate(requests, 1):
+                frame = seen_frames.get(screenshot_path)
+                if frame is None:
+                    image_data = encode_screenshot(screenshot_path)
+                    parts.append(self._get_image_part(image_data))
+                    seen_frames[screenshot_path] = k
+                    prefix = f"TASK {k}"
+                else:
+                    prefix = f"TASK {k} (same screenshot as TASK {frame})"
+                parts.append(types.Part.from_text(text=f"{prefix}: {user_request}"))
+
+            batch_instruction = (
+                self.SYSTEM_INSTRUCTION
+                + "\n\nBATCH MODE: You receive several independent TASK blocks, each "
+                "preceded by its own screenshot (tasks may share one). Handle "
+                "EVERY task. Before the thought and function calls for task k, "
+                "output a header line '### TASK k'. Never mix actions from "
+                "different tasks."
+            )
+
             response = self.client.models.generate_content(
                 model=self.model_name,
-                contents=[
-                    types.Content(
-                        role="user",
-                        parts=[
-                            types.Part.from_bytes(data=image_data, mime_type="image/png"),
-                            types.Part.from_text(text=full_prompt)
-                        ]
-                    )
-                ],
-                config=types.GenerateContentConfig(
-                    system_instruction=self.SYSTEM_INSTRUCTION,
-                    tools=self.tools,
-                    temperature=0.1, 
+                contents=[types.Content(role="user", parts=parts)],
+                config=self._action_config(
+                    system_instruction=batch_instruction,
+                    max_output_tokens=256 * len(requests),
                 )
             )
-            
-            # Safe parsing of tool calls
-            result = {"text_response": "", "function_calls": [], "finish_reason": "UNKNOWN"}
+
+            results = [AnalyzeResult() for _ in requests]
+
+            # Route parts to tasks based on the most recent '### TASK k' header
+            current = 0
             if response.candidates:
-                result["finish_reason"] = response.candidates[0].finish_reason
-                parts = response.candidates[0].content.parts or []
-                for part in parts:
+                finish_reason = _finish_reason_name(response.candidates[0].finish_reason)
+                for result in results:
+                    result.finish_reason = finish_reason
+
+                for part in response.candidates[0].content.parts or []:
                     if part.text:
-                        result["text_response"] += part.text
+                        for line in part.text.split('\n'):
+                            match = self._TASK_HEADER_RE.match(line.strip())
+                            if match:
+                                index = int(match.group(1)) - 1
+                                if 0 <= index < len(results):
+                                    current = index
+                                continue
+                            results[current].text_response += line + "\n"
                     elif part.function_call:
-                        result["function_calls"].append({
+                        results[current].function_calls.append({
                             "name": part.function_call.name,
-                            "args": dict(part.function_call.args)
+                            "args": _function_call_args(part.function_call)
                         })
-            
-            if self.logger:
-                self.logger.log_ai_response(result)
-            return result
+
+            for result in results:
+                if self.logger:
+                    self.logger.log_ai_response(self._loggable_result(result))
+                result.plan = self.build_execution_plan(result.function_calls)
+
+            return results
         except Exception as e:
-            raise GeminiAgentError(f"Analysis failed: {e}")
+            raise GeminiAgentError(f"Batch analysis failed: {e}")
+
+    def analyze_screenshot_batch(
+        self,
+        user_requests: List[str],
+        screenshot_path: str
+    ) -> List[AnalyzeResult]:
+        """
+        Analyze several independent requests against one shared screenshot.
+
+        Convenience wrapper over analyze_and_act_batch for QA/eval sweeps:
+        the frame is uploaded and prefilled once no matter how many tasks
+        reference it.
+        """
+        return self.analyze_and_act_batch(
+            [(request, screenshot_path) for request in user_requests]
+        )
 
     def chat(self, message: str, screenshot_path: Optional[str] = None) -> str:
         """
@@ -408,15 +1654,95 @@ TASK: {user_request}"""
         try:
             parts = [types.Part.from_text(text=message)]
             if screenshot_path:
-                with open(screenshot_path, "rb") as f:
-                    image_data = f.read()
-                parts.insert(0, types.Part.from_bytes(data=image_data, mime_type="image/png"))
+                image_data = encode_screenshot(screenshot_path)
+                parts.insert(0, self._get_image_part(image_data))
             
             response = self.client.models.generate_content(
                 model=self.model_name,
                 contents=[types.Content(role="user", parts=parts)],
-                config=types.GenerateContentConfig(system_instruction=self.SYSTEM_INSTRUCTION, temperature=0.7)
+                config=self._chat_config
             )
             return response.text
         except Exception as e:
-            raise GeminiAgentError(f"Chat failed: {e}")
\ No newline at end of file
+            raise GeminiAgentError(f"Chat failed: {e}")
+
+    async def chat_async(self, message: str, screenshot_path: Optional[str] = None) -> str:
+        """
+        Async variant of chat using the non-blocking Gemini client.
+        """
+        try:
+            parts = [types.Part.from_text(text=message)]
+            if screenshot_path:
+                image_data = await asyncio.to_thread(encode_screenshot, screenshot_path)
+                parts.insert(0, self._get_image_part(image_data))
+
+            response = await self._generate_async(
+                [types.Content(role="user", parts=parts)], self._chat_config
+            )
+            return response.text
+        except Exception as e:
+            raise GeminiAgentError(f"Chat failed: {e}")
+
+class BatchScheduler:
+    """
+    Coalesce near-simultaneous analysis requests into shared Gemini calls.
+
+    Requests submitted within a short window (max_wait_ms) are packed into
+    one analyze_and_act_batch call, amortizing the round-trip and prefill
+    across them; a request that arrives alone falls through to the plain
+    single-call async path with no added latency beyond the window.
+    """
+
+    def __init__(
+        self,
+        agent: GeminiAgent,
+        max_batch: int = 4,
+        max_wait_ms: float = 25.0
+    ) -> None:
+        self.agent = agent
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue: "asyncio.Queue" = asyncio.Queue()
+        self._worker: Optional["asyncio.Task"] = None
+
+    async def submit(self, user_request: str, screenshot_path: str) -> AnalyzeResult:
+        """Queue one request and await its individual result."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        await self._queue.put((user_request, screenshot_path, future))
+        if self._worker is None or self._worker.done():
+            self._worker = loop.create_task(self._drain())
+        return await future
+
+    async def _drain(self) -> None:
+        loop = asyncio.get_running_loop()
+        while not self._queue.empty():
+            batch = [self._queue.get_nowait()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            try:
+                if len(batch) == 1:
+                    request, path, future = batch[0]
+                    result = await self.agent.analyze_and_act_async(request, path)
+                    if not future.done():
+                        future.set_result(result)
+                else:
+                    results = await asyncio.to_thread(
+                        self.agent.analyze_and_act_batch,
+                        [(request, path) for request, path, _ in batch]
+                    )
+                    for (_, _, future), result in zip(batch, results):
+                        if not future.done():
+                            future.set_result(result)
+            except Exception as e:
+                for _, _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)